@@ -0,0 +1,168 @@
+import time
+import threading
+import collections
+import numpy
+from Framebuffer import Framebuffer
+from ledboard import NetworkConnector
+from ledboard import ledboard_width, ledboard_height
+
+
+class Shard(object):
+    """
+        one board of a VirtualCanvas, tile is a view on the canvas pixels,
+        front holds the frame being sent while the next one is drawn.
+    """
+    def __init__(self, canvas, connector, region):
+        self.canvas = canvas
+        self.connector = connector
+        self.region = region
+        x, y, width, height = region
+        self.tile = Framebuffer(width, height,
+                                canvas.pixels[y:y + height, x:x + width])
+        self.front = Framebuffer(width, height)
+        self.finished = 0.
+        self.errors = 0
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+
+    def send(self, packet):
+        """ send a packet, False when it failed."""
+        try:
+            self.connector.send(packet)
+        except Exception:
+            self.errors += 1
+            return False
+        return True
+
+    def run(self):
+        """
+            send a frame every time the canvas presents one. errors are
+            counted, never raised, so this board keeps meeting the others
+            at the barriers and one bad board can not stall the wall.
+        """
+        canvas = self.canvas
+        while(True):
+            try:
+                canvas.go.wait()
+            except threading.BrokenBarrierError:
+                return
+            try:
+                packets = list(self.connector.packets(self.front))
+                for packet in packets[:-1]:
+                    if not self.send(packet):
+                        # the frame is lost, one error for it is enough.
+                        packets = []
+                        break
+                    time.sleep(self.connector.send_timeout)
+            except Exception:
+                self.errors += 1
+                packets = []
+            try:
+                # every board gets its last chunk at the same moment.
+                canvas.sync.wait()
+                if packets:
+                    self.send(packets[-1])
+                self.finished = time.time()
+                canvas.done.wait()
+            except threading.BrokenBarrierError:
+                return
+
+
+class VirtualCanvas(Framebuffer):
+    """
+        a surface spanning a wall of boards, boards lists a connector or
+        (host, port) per board in row major order, columns wide.
+        every board is sent its tile from its own thread, the final chunk
+        of a frame is held back until all boards are ready for it.
+    """
+    def __init__(self, boards, columns, board_width=ledboard_width,
+                 board_height=ledboard_height):
+        rows = (len(boards) + columns - 1) // columns
+        Framebuffer.__init__(self, board_width * columns, board_height * rows)
+        self.columns = columns
+        self.rows = rows
+        self.board_width = board_width
+        self.board_height = board_height
+        self.go = threading.Barrier(len(boards) + 1)
+        self.sync = threading.Barrier(len(boards))
+        self.done = threading.Barrier(len(boards) + 1)
+        self.shards = []
+        for i, board in enumerate(boards):
+            if not isinstance(board, NetworkConnector):
+                board = NetworkConnector(*board)
+            x = (i % columns) * board_width
+            y = (i // columns) * board_height
+            region = (x, y, board_width, board_height)
+            self.shards.append(Shard(self, board, region))
+        self.sending = False
+        self.frame_start = 0.
+        self.frames = 0
+        self.skews = collections.deque(maxlen=100)
+        self.frame_times = collections.deque(maxlen=100)
+        for shard in self.shards:
+            shard.thread.start()
+
+    def finish(self):
+        """ wait for the frame being sent and record its timing."""
+        if not self.sending:
+            return
+        self.done.wait()
+        self.sending = False
+        finished = [shard.finished for shard in self.shards]
+        self.skews.append(max(finished) - min(finished))
+        self.frame_times.append(max(finished) - self.frame_start)
+        self.frames += 1
+
+    def present(self, wait=False):
+        """
+            send the current pixels to all boards, returns once sending
+            started so the next frame can be drawn, unless wait is set.
+        """
+        self.finish()
+        for shard in self.shards:
+            numpy.copyto(shard.front.pixels, shard.tile.pixels)
+        self.frame_start = time.time()
+        self.go.wait()
+        self.sending = True
+        if wait:
+            self.finish()
+
+    def stats(self):
+        """ frame count and skew between the boards, in seconds."""
+        skews = list(self.skews) or [0.]
+        frame_times = list(self.frame_times) or [0.]
+        return {
+            'frames': self.frames,
+            'skew': skews[-1],
+            'max_skew': max(skews),
+            'mean_skew': sum(skews) / len(skews),
+            'frame_time': sum(frame_times) / len(frame_times),
+            'errors': sum(shard.errors for shard in self.shards),
+        }
+
+    def close(self):
+        self.finish()
+        for barrier in (self.go, self.sync, self.done):
+            barrier.abort()
+        for shard in self.shards:
+            shard.thread.join()
+
+
+def canvas_test(boards, columns, effect='plasma', fps=30):
+    from Effects import EffectEngine
+
+    canvas = VirtualCanvas(boards, columns)
+    engine = EffectEngine(canvas, effect)
+    while(True):
+        engine.render()
+        canvas.present()
+        if canvas.frames and canvas.frames % 100 == 0:
+            print(canvas.stats())
+        time.sleep(1. / fps)
+
+
+def main():
+    canvas_test([('ledboard', 1337)], 1)
+
+if __name__ == "__main__":
+    main()
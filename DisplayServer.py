@@ -0,0 +1,417 @@
+import os
+import mmap
+import array
+import errno
+import signal
+import time
+import json
+import socket
+import select
+import tempfile
+import numpy
+from Framebuffer import Framebuffer
+from ledboard import get_netcon, get_panelorder
+from ledboard import panel_width, panel_height
+from ledboard import ledboard_width, ledboard_height
+
+socket_path = os.path.join(tempfile.gettempdir(), 'ledboard.sock')
+
+if os.path.isdir('/dev/shm'):
+    shared_dir = '/dev/shm'
+else:
+    shared_dir = tempfile.gettempdir()
+
+# a client with this many reply bytes unread is disconnected.
+max_backlog = 65536
+
+
+class LeaseError(Exception):
+    pass
+
+
+def panel_region(index):
+    """ the x, y, width, height of panel number index in panelorder."""
+    panelorder = get_panelorder()
+    if index < 0 or index >= len(panelorder):
+        raise LeaseError("no panel %d" % (index, ))
+    px, py = panelorder[index]
+    return (px * panel_width, py * panel_height, panel_width, panel_height)
+
+
+def map_surface(fd, width, height):
+    """
+        map a shared file as a Framebuffer, the pixels live in the
+        mapping itself so writes are seen by every process mapping it.
+    """
+    shared = mmap.mmap(fd, width * height)
+    pixels = numpy.frombuffer(shared, dtype=numpy.uint8)
+    surface = Framebuffer(width, height, pixels.reshape(height, width))
+    return shared, surface
+
+
+def unmap(shared):
+    """ close a mapping, unless a surface on it is still in use."""
+    try:
+        shared.close()
+    except BufferError:
+        # arrays still look at it, it gets closed once they are gone.
+        pass
+
+
+def send_fds(sock, data, fds):
+    """ send data with file descriptors fds, returns the bytes sent."""
+    if not fds:
+        return sock.send(data)
+    rights = (socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array('i', fds))
+    return sock.sendmsg([data], [rights])
+
+
+def recv_fds(sock, size, maxfds=4):
+    """ receive up to size bytes, and the file descriptors sent along."""
+    itemsize = array.array('i').itemsize
+    data, ancdata, flags, address = sock.recvmsg(
+        size, socket.CMSG_SPACE(maxfds * itemsize))
+    fds = array.array('i')
+    for level, kind, cdata in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(cdata[:len(cdata) - len(cdata) % itemsize])
+    return data, list(fds)
+
+
+class Lease(object):
+    """
+        a region of the display handed out to one client. the shared file
+        is unlinked right away, the client gets it as a file descriptor
+        over the socket, so nothing is left behind however we exit.
+    """
+    def __init__(self, ident, region, client):
+        self.ident = ident
+        self.region = region
+        self.client = client
+        x, y, width, height = region
+        self.fd, path = tempfile.mkstemp(prefix='ledboard-lease-',
+                                         dir=shared_dir)
+        try:
+            os.unlink(path)
+            os.ftruncate(self.fd, width * height)
+            self.shared, self.surface = map_surface(self.fd, width, height)
+        except Exception:
+            os.close(self.fd)
+            raise
+
+    def overlaps(self, region):
+        x, y, width, height = self.region
+        ox, oy, owidth, oheight = region
+        return (x < ox + owidth and ox < x + width and
+                y < oy + oheight and oy < y + height)
+
+    def close(self):
+        self.surface = None
+        unmap(self.shared)
+        os.close(self.fd)
+
+
+class DisplayServer(object):
+    """
+        owns the connection to the ledboard, clients lease regions of it
+        over a unix socket and draw in to shared memory. when a client
+        signals a finished frame its region is copied in to the
+        framebuffer, which is sent to the board at a fixed rate.
+    """
+    def __init__(self, connector, path=socket_path, fps=30,
+                 width=ledboard_width, height=ledboard_height):
+        self.connector = connector
+        self.path = path
+        self.interval = 1. / fps
+        self.width = width
+        self.height = height
+        self.framebuffer = Framebuffer(width, height)
+        self.leases = {}
+        self.clients = {}
+        self.outgoing = {}
+        self.next_ident = 1
+        self.dirty = False
+        self.running = False
+        self.listener = None
+
+    def lease(self, client, region):
+        x, y, width, height = [int(value) for value in region]
+        region = (x, y, width, height)
+        if width <= 0 or height <= 0 or x < 0 or y < 0 or \
+           x + width > self.width or y + height > self.height:
+            raise LeaseError("region %r is outside the display" % (region, ))
+        for lease in self.leases.values():
+            if lease.overlaps(region):
+                raise LeaseError("region %r overlaps lease %d" %
+                                 (region, lease.ident))
+        lease = Lease(self.next_ident, region, client)
+        self.leases[lease.ident] = lease
+        self.next_ident += 1
+        return lease
+
+    def get_lease(self, client, ident):
+        lease = self.leases.get(ident)
+        if lease is None or lease.client is not client:
+            raise LeaseError("no lease %r for this client" % (ident, ))
+        return lease
+
+    def release(self, lease):
+        del self.leases[lease.ident]
+        x, y, width, height = lease.region
+        self.framebuffer.pixels[y:y + height, x:x + width] = 0
+        self.dirty = True
+        lease.close()
+
+    def present(self, lease):
+        """ copy a finished frame of a lease in to the framebuffer."""
+        x, y, width, height = lease.region
+        self.framebuffer.pixels[y:y + height, x:x + width] = \
+            lease.surface.pixels
+        self.dirty = True
+
+    def handle(self, client, message):
+        op = message.get('op')
+        try:
+            if op == 'lease':
+                if 'panel' in message:
+                    region = panel_region(int(message['panel']))
+                else:
+                    region = message['region']
+                lease = self.lease(client, region)
+                return {'id': lease.ident, 'region': list(lease.region)}
+            elif op == 'frame':
+                self.present(self.get_lease(client, message['id']))
+                return {'id': message['id']}
+            elif op == 'release':
+                self.release(self.get_lease(client, message['id']))
+                return {'id': message['id']}
+            else:
+                raise LeaseError("unknown op %r" % (op, ))
+        except (LeaseError, KeyError, IndexError, TypeError,
+                ValueError) as e:
+            return {'error': str(e)}
+
+    def accept(self):
+        client, address = self.listener.accept()
+        # a client that does not read its replies must not stall the rest.
+        client.setblocking(False)
+        self.clients[client] = b''
+        self.outgoing[client] = []
+
+    def disconnect(self, client):
+        for lease in list(self.leases.values()):
+            if lease.client is client:
+                self.release(lease)
+        del self.clients[client]
+        del self.outgoing[client]
+        client.close()
+
+    def decode(self, line):
+        """ parse a request line, None when it is not a json object."""
+        try:
+            message = json.loads(line.decode('utf-8'))
+        except ValueError:
+            return None
+        if not isinstance(message, dict):
+            return None
+        return message
+
+    def receive(self, client):
+        """
+            handle the requests a client sent, a client that sends
+            garbage or goes away is disconnected, the others keep going.
+        """
+        try:
+            data = client.recv(4096)
+        except socket.error as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return
+            data = b''
+        if not data:
+            self.disconnect(client)
+            return
+        data = self.clients[client] + data
+        while b'\n' in data:
+            line, data = data.split(b'\n', 1)
+            message = self.decode(line)
+            if message is None:
+                self.disconnect(client)
+                return
+            reply = self.handle(client, message)
+            fds = []
+            if 'id' in reply and message.get('op') == 'lease':
+                fds = [self.leases[reply['id']].fd]
+            self.reply(client, json.dumps(reply).encode('utf-8') + b'\n',
+                       fds)
+            if client not in self.clients:
+                return
+        self.clients[client] = data
+
+    def reply(self, client, data, fds=()):
+        """ queue a reply, a client too far behind is disconnected."""
+        outgoing = self.outgoing[client]
+        outgoing.append([data, list(fds)])
+        if sum(len(data) for data, fds in outgoing) > max_backlog:
+            self.disconnect(client)
+            return
+        self.flush(client)
+
+    def flush(self, client):
+        """ send what a client has queued, as far as it does not block."""
+        outgoing = self.outgoing[client]
+        while outgoing:
+            data, fds = outgoing[0]
+            try:
+                sent = send_fds(client, data, fds)
+            except socket.error as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return
+                self.disconnect(client)
+                return
+            # descriptors go along with the first byte sent.
+            outgoing[0] = [data[sent:], []]
+            if sent == len(data):
+                outgoing.pop(0)
+
+    def transmit(self):
+        if self.dirty:
+            self.connector.send_packet(self.framebuffer)
+            self.dirty = False
+
+    def terminate(self, signum, frame):
+        # leave through the finally of serve_forever, which cleans up.
+        raise SystemExit(0)
+
+    def serve_forever(self):
+        """ serve until stopped, SIGTERM included when in the main thread."""
+        try:
+            previous = signal.signal(signal.SIGTERM, self.terminate)
+        except ValueError:
+            # only the main thread can handle signals.
+            previous = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(self.path)
+        self.listener.listen(8)
+        self.running = True
+        next_frame = time.time()
+        try:
+            while(self.running):
+                timeout = max(0, next_frame - time.time())
+                sockets = [self.listener] + list(self.clients)
+                waiting = [client for client in self.clients
+                           if self.outgoing[client]]
+                readable, writable, _ = select.select(sockets, waiting, [],
+                                                      timeout)
+                for sock in writable:
+                    if sock in self.clients:
+                        self.flush(sock)
+                for sock in readable:
+                    if sock is self.listener:
+                        self.accept()
+                    elif sock in self.clients:
+                        self.receive(sock)
+                now = time.time()
+                if now >= next_frame:
+                    self.transmit()
+                    next_frame += self.interval
+                    # do not try to catch up on frames we missed.
+                    if next_frame < now:
+                        next_frame = now + self.interval
+        finally:
+            self.close()
+            if previous is not None:
+                signal.signal(signal.SIGTERM, previous)
+
+    def close(self):
+        self.running = False
+        for client in list(self.clients):
+            self.disconnect(client)
+        if self.listener:
+            self.listener.close()
+            self.listener = None
+            os.unlink(self.path)
+
+
+class ClientLease(object):
+    """ the client side of a lease, draw on surface and call present."""
+    def __init__(self, client, ident, region, fd):
+        self.client = client
+        self.ident = ident
+        self.region = tuple(region)
+        x, y, width, height = self.region
+        self.width, self.height = width, height
+        try:
+            self.shared, self.surface = map_surface(fd, width, height)
+        finally:
+            os.close(fd)
+
+    def present(self):
+        """ signal a finished frame, returns once the server copied it."""
+        self.client.request({'op': 'frame', 'id': self.ident})
+
+    def release(self):
+        self.client.request({'op': 'release', 'id': self.ident})
+        self.surface = None
+        unmap(self.shared)
+
+
+class DisplayClient(object):
+    def __init__(self, path=socket_path):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.buffer = b''
+        self.fds = []
+
+    def request(self, message):
+        self.sock.sendall(json.dumps(message).encode('utf-8') + b'\n')
+        while b'\n' not in self.buffer:
+            data, fds = recv_fds(self.sock, 4096)
+            self.fds.extend(fds)
+            if not data:
+                raise LeaseError("display server closed the connection")
+            self.buffer += data
+        line, self.buffer = self.buffer.split(b'\n', 1)
+        reply = json.loads(line.decode('utf-8'))
+        if 'error' in reply:
+            raise LeaseError(reply['error'])
+        return reply
+
+    def lease(self, region=None, panel=None):
+        """ lease a region (x, y, width, height) or a panel by index."""
+        if panel is not None:
+            reply = self.request({'op': 'lease', 'panel': panel})
+        else:
+            reply = self.request({'op': 'lease', 'region': list(region)})
+        if not self.fds:
+            raise LeaseError("display server sent no file for the lease")
+        return ClientLease(self, reply['id'], reply['region'],
+                           self.fds.pop(0))
+
+    def close(self):
+        for fd in self.fds:
+            os.close(fd)
+        self.fds = []
+        self.sock.close()
+
+
+def effect_client(effect='plasma', panel=0, fps=30):
+    from Effects import EffectEngine
+
+    client = DisplayClient()
+    lease = client.lease(panel=panel)
+    engine = EffectEngine(lease.surface, effect)
+    while(True):
+        engine.render()
+        lease.present()
+        time.sleep(1. / fps)
+
+
+def main():
+    server = DisplayServer(get_netcon())
+    server.serve_forever()
+    # effect_client('plasma', panel=0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import time
+import numpy
+from Framebuffer import Framebuffer
+
+ledboard_width, ledboard_height = 96, 48
+
+# names usable inside string expressions, next to the grid variables.
+expression_names = ['sin', 'cos', 'tan', 'sqrt', 'abs', 'exp', 'log',
+                    'floor', 'hypot', 'arctan2', 'mod', 'minimum',
+                    'maximum', 'clip', 'where', 'pi']
+
+_grids = {}
+
+
+class Grid(object):
+    """
+        coordinate grids for a surface size, computed once.
+        x, y are pixel positions, u, v are positions relative to the
+        center scaled to -1..1, r and a are radius and angle around it.
+    """
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        y, x = numpy.mgrid[0:height, 0:width].astype(numpy.float32)
+        cx, cy = (width - 1) / 2., (height - 1) / 2.
+        scale = max(cx, cy, 1.)
+        self.x = x
+        self.y = y
+        self.u = (x - cx) / scale
+        self.v = (y - cy) / scale
+        self.r = numpy.hypot(self.u, self.v)
+        self.a = numpy.arctan2(self.v, self.u)
+        # grids are shared between engines, keep them from being changed.
+        for grid in (self.x, self.y, self.u, self.v, self.r, self.a):
+            grid.flags.writeable = False
+
+
+def get_grid(width, height):
+    """ return the cached grid for this size, generate it when missing."""
+    key = (width, height)
+    if key not in _grids:
+        _grids[key] = Grid(width, height)
+    return _grids[key]
+
+
+def expression(source):
+    """
+        compile a string such as 'sin(x / 4 + t) / 2 + .5' in to an effect,
+        it can use x, y, u, v, r, a, t and the numpy functions
+        listed in expression_names.
+    """
+    code = compile(source, '<effect>', 'eval')
+    names = dict((name, getattr(numpy, name)) for name in expression_names)
+    names['__builtins__'] = {}
+
+    def effect(g, t):
+        scope = {'x': g.x, 'y': g.y, 'u': g.u, 'v': g.v,
+                 'r': g.r, 'a': g.a, 't': t}
+        return eval(code, names, scope)
+    effect.__name__ = source
+    return effect
+
+
+def plasma(g, t):
+    value = numpy.sin(g.x * .16 + t)
+    value += numpy.sin(g.y * .12 - t * 1.3)
+    value += numpy.sin((g.x + g.y) * .08 + t * .7)
+    value += numpy.sin(g.r * 6 - t * 2)
+    return value / 8 + .5
+
+
+def interference(g, t):
+    d1 = numpy.hypot(g.u - numpy.cos(t) * .6, g.v - numpy.sin(t * .7) * .6)
+    d2 = numpy.hypot(g.u + numpy.cos(t * .8) * .6, g.v + numpy.sin(t) * .6)
+    return (numpy.sin(d1 * 20 - t * 4) + numpy.sin(d2 * 20 - t * 4)) / 4 + .5
+
+
+def tunnel(g, t):
+    depth = numpy.floor(1 / (g.r + .1) * 2 + t * 2)
+    twist = numpy.floor(g.a * 8 / numpy.pi + t)
+    return numpy.mod(depth + twist, 2) * numpy.minimum(g.r * 1.5, 1)
+
+
+def rings(g, t):
+    return numpy.sin(g.r * 12 - t * 4) / 2 + .5
+
+
+def spiral(g, t):
+    return numpy.sin(g.a * 3 + g.r * 10 - t * 3) / 2 + .5
+
+
+effects = {
+    'plasma': plasma,
+    'interference': interference,
+    'tunnel': tunnel,
+    'rings': rings,
+    'spiral': spiral,
+}
+
+
+class EffectEngine(object):
+    """
+        evaluates an effect f(grid, t) over the whole surface at once,
+        the effect returns brightness in 0..1 which is scaled to the
+        color depth of the surface and written in to its pixels.
+    """
+    def __init__(self, surface, effect):
+        self.surface = surface
+        self.grid = get_grid(surface.width, surface.height)
+        self.scratch = numpy.empty((surface.height, surface.width),
+                                   dtype=numpy.float32)
+        self.start = time.time()
+        self.set_effect(effect)
+
+    def set_effect(self, effect):
+        if isinstance(effect, str):
+            if effect in effects:
+                effect = effects[effect]
+            else:
+                effect = expression(effect)
+        self.effect = effect
+
+    def render(self, t=None):
+        if t is None:
+            t = time.time() - self.start
+        values = self.effect(self.grid, t)
+        depth = self.surface.color_depth
+        numpy.multiply(values, depth, out=self.scratch, casting='unsafe')
+        numpy.clip(self.scratch, 0, depth, out=self.scratch)
+        numpy.copyto(self.surface.pixels, self.scratch, casting='unsafe')
+        return self.surface
+
+
+def benchmark(frames=200, width=ledboard_width, height=ledboard_height):
+    """ time every built in effect, returns seconds per frame by name."""
+    surface = Framebuffer(width, height)
+    results = {}
+    for name in sorted(effects):
+        engine = EffectEngine(surface, name)
+        engine.render(0)
+        start = time.time()
+        for i in range(frames):
+            engine.render(i / 30.)
+        results[name] = (time.time() - start) / frames
+    return results
+
+
+def benchmark_test():
+    results = benchmark()
+    for name in sorted(results):
+        print("%-14s %8.3f ms/frame" % (name, results[name] * 1000))
+
+
+def effect_test(effect='plasma', fps=30):
+    from ledboard import get_netcon
+
+    netcon = get_netcon()
+    surface = Framebuffer(ledboard_width, ledboard_height)
+    engine = EffectEngine(surface, effect)
+    while(True):
+        netcon.send_packet(engine.render())
+        time.sleep(1. / fps)
+
+
+def main():
+    benchmark_test()
+    # effect_test('plasma')
+    # effect_test('sin(u * 8 + t) * cos(v * 6 - t) / 2 + .5')
+
+if __name__ == "__main__":
+    main()
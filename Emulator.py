@@ -0,0 +1,91 @@
+import sys
+import time
+import socket
+import struct
+import numpy
+from Framebuffer import Framebuffer
+from ledboard import ledboard_width, ledboard_height, ack_format
+
+
+class Emulator(object):
+    """
+        a stand in for the ledboard that listens for the same datagrams,
+        a reset starts a frame, data packets fill it up. every frame that
+        ends, complete or torn by the next reset, is acknowledged to the
+        sender with an ack_format ack saying whether it was shown, which
+        an AdaptivePacer with acks uses as delivery feedback.
+        delay is spent on every datagram, to emulate a slow board.
+    """
+    def __init__(self, host='127.0.0.1', port=1337, width=ledboard_width,
+                 height=ledboard_height, delay=0., rcvbuf=None):
+        self.framebuffer = Framebuffer(width, height)
+        self.frame_size = width * height
+        self.buffer = bytearray(self.frame_size)
+        self.received = 0
+        self.sender = None
+        self.delay = delay
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if rcvbuf:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        self.sock.bind((host, port))
+        self.address = self.sock.getsockname()
+        self.running = False
+        self.frames = 0
+        self.torn = 0
+        self.packets = 0
+
+    def acknowledge(self, shown):
+        if self.sender is not None:
+            self.sock.sendto(struct.pack(ack_format, b'A', shown,
+                                         self.received), self.sender)
+
+    def end_frame(self):
+        shown = self.received >= self.frame_size
+        if shown:
+            pixels = numpy.frombuffer(bytes(self.buffer), dtype=numpy.uint8)
+            self.framebuffer.pixels[...] = pixels.reshape(
+                self.framebuffer.height, self.framebuffer.width)
+            self.frames += 1
+        elif self.received:
+            self.torn += 1
+        self.acknowledge(shown)
+        self.received = 0
+
+    def handle(self, data, sender):
+        self.packets += 1
+        kind, data = data[:1], data[1:]
+        if kind == b'\x80':
+            if self.received:
+                self.end_frame()
+            self.sender = sender
+        elif kind != b'\x00':
+            return
+        end = min(self.received + len(data), self.frame_size)
+        self.buffer[self.received:end] = data[:end - self.received]
+        self.received += len(data)
+        if self.received >= self.frame_size:
+            self.end_frame()
+
+    def serve_forever(self):
+        self.running = True
+        while(self.running):
+            data, sender = self.sock.recvfrom(2048)
+            self.handle(data, sender)
+            if self.delay:
+                time.sleep(self.delay)
+
+    def stats(self):
+        return {'frames': self.frames, 'torn': self.torn,
+                'packets': self.packets}
+
+
+def main():
+    port = 1337
+    if len(sys.argv) > 1:
+        port = int(sys.argv[1])
+    emulator = Emulator('0.0.0.0', port)
+    print("emulating a ledboard on %s:%d" % emulator.address)
+    emulator.serve_forever()
+
+if __name__ == "__main__":
+    main()
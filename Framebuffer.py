@@ -0,0 +1,44 @@
+import numpy
+
+
+class Framebuffer(object):
+    """
+        array backed surface, one byte per pixel in row major order,
+        it can stand in for a Surface when sending to the ledboard.
+    """
+    def __init__(self, width, height, pixels=None):
+        self.width = width
+        self.height = height
+        self.size = self.width * self.height
+        self.color_rep = (0, )
+        self.color_depth = 0x7f
+        if pixels is None:
+            pixels = numpy.zeros((self.height, self.width), dtype=numpy.uint8)
+        self.pixels = pixels
+
+    def fill(self, color):
+        if isinstance(color, tuple):
+            color = color[0]
+        self.pixels.fill(color)
+
+    def clear(self):
+        self.pixels.fill(0)
+
+    def get_list_rep(self):
+        return [(int(value), ) for value in self.pixels.ravel()]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.pixels.reshape(self.size, 1)[key]
+        else:
+            x, y = key
+            return (int(self.pixels[y, x]), )
+
+    def __setitem__(self, key, value):
+        x, y = key
+        if isinstance(value, tuple):
+            value = value[0]
+        self.pixels[y, x] = value
+
+    def __len__(self):
+        return self.size
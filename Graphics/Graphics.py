@@ -1,4 +1,8 @@
 import random
+from .Colors import BLACK
+# Raster.py lives in the repository root, which has to be on sys.path,
+# as it is when running from there.
+from Raster import Raster, RowStorage, ArrayStorage
 
 
 def randColor():
@@ -9,13 +13,42 @@ def randColor():
 
 
 class Graphics(object):
-    def __init__(self, width, height):
+    """
+        drawing on a surface of rows, done by the shared Raster.
+        storage 'rows' keeps surface as a list of rows of colors,
+        'array' keeps rgb colors in a compact numpy array.
+    """
+    def __init__(self, width, height, storage='rows'):
+        if storage not in ('rows', 'array'):
+            raise ValueError("unknown storage %r" % (storage, ))
         self.width = width
         self.height = height
         self.size = self.width * self.height
         self.widthRange = range(0, self.width)
         self.heightRange = range(0, self.height)
-        self.surface = self.generatesurface()
+        if storage == 'array':
+            self.storage = ArrayStorage(width, height, channels=3)
+        else:
+            self.storage = RowStorage(width, height, self.generatesurface())
+        self.raster = Raster(self.storage)
+
+    @property
+    def surface(self):
+        """
+            the rows of colors. with 'array' storage this is a copy,
+            changes to it only show once it is assigned back.
+        """
+        if isinstance(self.storage, RowStorage):
+            return self.storage.surface
+        return [[self.storage.read(x, y) for x in self.widthRange]
+                for y in self.heightRange]
+
+    @surface.setter
+    def surface(self, surface):
+        if isinstance(self.storage, RowStorage):
+            self.storage.surface = surface
+        else:
+            self.setSurface(surface, 2)
 
     def generatesurface(self):
         surface = []
@@ -31,31 +64,17 @@ class Graphics(object):
         return [l[i:i + n] for i in range(0, len(l), n)]
 
     def writePixel(self, x, y, color):
-        x, y = int(x), int(y)
-        if x >= self.width or y >= self.height:
-            return 0
-        elif x < 0 or y < 0:
-            return 0
-        else:
-            self.surface[y][x] = color
+        self.raster.drawPixel(x, y, color)
 
     def readPixel(self, x, y):
-        x, y = int(x), int(y)
-        if x >= self.width or y >= self.height:
-            return BLACK
-        elif x < 0 or y < 0:
-            return BLACK
-        else:
-            return self.surface[y][x]
+        return self.raster.readPixel(x, y, BLACK)
 
     def calcIndex(self, x, y):
         x, y = int(x), int(y)
         return ((y * self.width) + x)
 
     def fill(self, color):
-        for x in range(0, self.width):
-            for y in range(0, self.height):
-                self.drawPixel(x, y, color)
+        self.raster.fill(color)
 
     def getSurfaceSize(self):
         return self.size
@@ -77,85 +96,19 @@ class Graphics(object):
 
     def setSurface(self, surface, dimension=1):
         if dimension == 1:
-            surface = self.toMatrix(surface, 2)
-        self.surface = surface
+            surface = self.toMatrix(surface, self.width)
+        for y, row in enumerate(surface):
+            for x, color in enumerate(row):
+                self.storage.write(x, y, self.storage.encode(color))
 
     def drawPixel(self, x, y, color):
-        self.writePixel(x, y, color)
+        self.raster.drawPixel(x, y, color)
 
-# wiki http://www.roguebasin.com/index.php?title=Bresenham%27s_Line_Algorithm
     def drawLine(self, x1, y1, x2, y2, color):
-        x1, y1 = int(x1), int(y1)
-        x2, y2 = int(x2), int(y2)
-        issteep = abs(y2 - y1) > abs(x2 - x1)
-        if issteep:
-            x1, y1 = y1, x1
-            x2, y2 = y2, x2
-        rev = False
-        if x1 > x2:
-            x1, x2 = x2, x1
-            y1, y2 = y2, y1
-            rev = True
-        deltax = x2 - x1
-        deltay = abs(y2 - y1)
-        error = int(deltax / 2)
-        y = y1
-        ystep = None
-        if y1 < y2:
-            ystep = 1
-        else:
-            ystep = -1
-        for x in range(x1, x2 + 1):
-            if issteep:
-                self.writePixel(y, x, color)
-            else:
-                self.writePixel(x, y, color)
-            error -= deltay
-            if error < 0:
-                y += ystep
-                error += deltax
-        if rev:
-            self.surface.reverse()
+        self.raster.drawLine(x1, y1, x2, y2, color)
 
     def drawRect(self, x, y, width, height, color):
-        x, y = int(x), int(y)
-        width, height = int(width), int(height)
-        # because cordinate system starts at 0
-        width, height = width - 1, height - 1
-        self.drawLine(x, y, x + width, y, color)
-        self.drawLine(x, y + height, x + width, y + height, color)
-        self.drawLine(x, y, x, y + height, color)
-        self.drawLine(x + width, y, x + width, y + height, color)
+        self.raster.drawRect(x, y, width, height, color)
 
     def drawCircle(self, x0, y0, radius, color):
-        x0, y0 = int(x0), int(y0)
-        radius = int(radius)
-        # brensenham circle
-        error = 1 - radius
-        errory = 1
-        errorx = -2 * radius
-        x = radius
-        y = 0
-        self.writePixel(x0, y0 + radius, color)
-        self.writePixel(x0, y0 - radius, color)
-        self.writePixel(x0 + radius, y0, color)
-        self.writePixel(x0 - radius, y0, color)
-        while(y < x):
-            if(error > 0):
-                x -= 1
-                errorx += 2
-                error += errorx
-            y += 1
-            errory += 2
-            error += errory
-            self.writePixel(x0 + x, y0 + y, color)
-            self.writePixel(x0 - x, y0 + y, color)
-            self.writePixel(x0 + x, y0 - y, color)
-            self.writePixel(x0 - x, y0 - y, color)
-            self.writePixel(x0 + y, y0 + x, color)
-            self.writePixel(x0 - y, y0 + x, color)
-            self.writePixel(x0 + y, y0 - x, color)
-            self.writePixel(x0 - y, y0 - x, color)
-            self.writePixel(x0 - y, y0 + x, color)
-            self.writePixel(x0 + y, y0 - x, color)
-            self.writePixel(x0 - y, y0 - x, color)
+        self.raster.drawCircle(x0, y0, radius, color)
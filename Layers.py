@@ -0,0 +1,238 @@
+import time
+import numpy
+from Framebuffer import Framebuffer
+from Raster import Raster, ArrayStorage
+from ledboard import ledboard_width, ledboard_height
+
+# above this many dirty rectangles a layer keeps their bounding box.
+max_dirty = 16
+
+
+def intersects(a, b):
+    """ do rectangles (x, y, width, height) a and b overlap or touch."""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    return ax <= bx + bw and bx <= ax + aw and ay <= by + bh and by <= ay + ah
+
+
+def union(a, b):
+    """ the bounding rectangle of rectangles a and b."""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    x, y = min(ax, bx), min(ay, by)
+    return (x, y, max(ax + aw, bx + bw) - x, max(ay + ah, by + bh) - y)
+
+
+def merge(rects, rect):
+    """ add rect to a list of rectangles, joining the ones it touches."""
+    merged = True
+    while(merged):
+        merged = False
+        for other in rects:
+            if intersects(other, rect):
+                rects.remove(other)
+                rect = union(other, rect)
+                merged = True
+                break
+    rects.append(rect)
+    if len(rects) > max_dirty:
+        bounds = rects[0]
+        for other in rects[1:]:
+            bounds = union(bounds, other)
+        rects[:] = [bounds]
+    return rects
+
+
+class Layer(Framebuffer):
+    """
+        a drawable layer for a LayerStack, pixels equal to color_key are
+        transparent. draw calls record the rectangles they touch so only
+        those get composited again.
+    """
+    def __init__(self, width, height, color_key=None, opacity=1.):
+        Framebuffer.__init__(self, width, height)
+        self.visible = True
+        self.opacity = opacity
+        self.color_key = color_key
+        self.z = 0
+        self.dirty = []
+        self.raster = Raster(ArrayStorage(width, height, self.pixels))
+        if color_key is not None:
+            self.pixels.fill(color_key)
+        self.mark_all()
+
+    def mark_dirty(self, x, y, width, height):
+        x0, y0 = max(int(x), 0), max(int(y), 0)
+        x1 = min(int(x) + int(width), self.width)
+        y1 = min(int(y) + int(height), self.height)
+        if x1 <= x0 or y1 <= y0:
+            return
+        merge(self.dirty, (x0, y0, x1 - x0, y1 - y0))
+
+    def mark_all(self):
+        self.dirty[:] = [(0, 0, self.width, self.height)]
+
+    def set_visible(self, visible):
+        if visible != self.visible:
+            self.visible = visible
+            self.mark_all()
+
+    def set_opacity(self, opacity):
+        if opacity != self.opacity:
+            self.opacity = opacity
+            self.mark_all()
+
+    def set_color_key(self, color_key):
+        if color_key != self.color_key:
+            self.color_key = color_key
+            self.mark_all()
+
+    def clear(self):
+        if self.color_key is None:
+            self.fill(0)
+        else:
+            self.fill(self.color_key)
+
+    def bounds(self, x1, y1, x2, y2):
+        """ mark the rectangle with corners x1, y1 and x2, y2 as dirty."""
+        x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+        self.mark_dirty(min(x1, x2), min(y1, y2),
+                        abs(x2 - x1) + 1, abs(y2 - y1) + 1)
+
+    def fill(self, color):
+        Framebuffer.fill(self, color)
+        self.mark_all()
+
+    def drawPixel(self, x, y, color):
+        self.raster.drawPixel(x, y, color)
+        self.mark_dirty(x, y, 1, 1)
+
+    def drawLine(self, x1, y1, x2, y2, color):
+        self.raster.drawLine(x1, y1, x2, y2, color)
+        self.bounds(x1, y1, x2, y2)
+
+    def drawRect(self, x, y, width, height, color):
+        self.raster.drawRect(x, y, width, height, color)
+        x, y = int(x), int(y)
+        self.bounds(x, y, x + int(width) - 1, y + int(height) - 1)
+
+    def drawCircle(self, x0, y0, radius, color):
+        self.raster.drawCircle(x0, y0, radius, color)
+        x0, y0, radius = int(x0), int(y0), int(radius)
+        self.bounds(x0 - radius, y0 - radius, x0 + radius, y0 + radius)
+
+    def __setitem__(self, key, value):
+        Framebuffer.__setitem__(self, key, value)
+        x, y = key
+        self.mark_dirty(x, y, 1, 1)
+
+
+class LayerStack(object):
+    """
+        composites layers in z order, lowest first, in to a Framebuffer.
+        only the rectangles the layers marked dirty are blended again.
+    """
+    def __init__(self, width, height, background=0):
+        self.width = width
+        self.height = height
+        self.background = background
+        self.framebuffer = Framebuffer(width, height)
+        self.framebuffer.fill(background)
+        self.layers = []
+        self.dirty = []
+
+    def add(self, layer=None, z=None, **kwargs):
+        """ put a layer on the stack, on top unless z is given."""
+        if layer is None:
+            layer = Layer(self.width, self.height, **kwargs)
+        if z is None:
+            z = self.layers[-1].z + 1 if self.layers else 0
+        layer.z = z
+        self.layers.append(layer)
+        self.layers.sort(key=lambda l: l.z)
+        layer.mark_all()
+        return layer
+
+    def remove(self, layer):
+        self.layers.remove(layer)
+        merge(self.dirty, (0, 0, self.width, self.height))
+
+    def set_z(self, layer, z):
+        layer.z = z
+        self.layers.sort(key=lambda l: l.z)
+        layer.mark_all()
+
+    def collect(self):
+        """ take the dirty rectangles of the stack and all its layers."""
+        rects = self.dirty
+        self.dirty = []
+        for layer in self.layers:
+            for rect in layer.dirty:
+                merge(rects, rect)
+            layer.dirty = []
+        return rects
+
+    def blend(self, out, layer, x, y, width, height):
+        src = layer.pixels[y:y + height, x:x + width]
+        mask = True
+        if layer.color_key is not None:
+            mask = src != layer.color_key
+        if layer.opacity >= 1.:
+            numpy.copyto(out, src, where=mask)
+        else:
+            mixed = out + (src.astype(numpy.float32) - out) * layer.opacity
+            numpy.copyto(out, mixed, casting='unsafe', where=mask)
+
+    def composite(self):
+        """
+            blend the dirty regions again, returns the rectangles
+            that changed in the framebuffer.
+        """
+        rects = self.collect()
+        pixels = self.framebuffer.pixels
+        for x, y, width, height in rects:
+            out = pixels[y:y + height, x:x + width]
+            out.fill(self.background)
+            for layer in self.layers:
+                if layer.visible and layer.opacity > 0:
+                    self.blend(out, layer, x, y, width, height)
+        return rects
+
+    def dirty_chunks(self, rects, chunksize=512):
+        """
+            the indexes of the chunksize pieces of the frame rects touch,
+            send_packet skips a frame when there are none.
+        """
+        chunks = set()
+        for x, y, width, height in rects:
+            for row in range(y, y + height):
+                start = row * self.width + x
+                end = start + width - 1
+                chunks.update(range(start // chunksize, end // chunksize + 1))
+        return sorted(chunks)
+
+
+def layer_test(fps=30):
+    from ledboard import get_netcon
+
+    netcon = get_netcon()
+    stack = LayerStack(ledboard_width, ledboard_height)
+    background = stack.add()
+    background.drawRect(0, 0, ledboard_width, ledboard_height, 0x20)
+    overlay = stack.add(color_key=0)
+    x = 0
+    while(True):
+        overlay.drawCircle(x % ledboard_width, ledboard_height / 2, 4, 0)
+        x += 1
+        overlay.drawCircle(x % ledboard_width, ledboard_height / 2, 4, 0x7f)
+        rects = stack.composite()
+        chunks = stack.dirty_chunks(rects, netcon.maxsend_size)
+        netcon.send_packet(stack.framebuffer, chunks)
+        time.sleep(1. / fps)
+
+
+def main():
+    layer_test()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,423 @@
+import time
+
+# how many line shapes an ArrayStorage keeps the offsets of.
+max_lines = 4096
+
+
+class Storage(object):
+    """
+        the base of the storage backends a Raster draws in to, they
+        provide encode, read, write, write_points, hline, vline, fill and
+        values. lines are drawn as points, unless a backend knows better.
+    """
+    def write_line(self, x1, y1, x2, y2, steep, color):
+        """
+            the bresenham line from x1 to x2, x1 <= x2, with x and y
+            swapped if steep.
+        """
+        deltax = x2 - x1
+        deltay = abs(y2 - y1)
+        error = deltax // 2
+        ystep = 1 if y1 < y2 else -1
+        y = y1
+        xs = range(x1, x2 + 1)
+        ys = []
+        for x in xs:
+            ys.append(y)
+            error -= deltay
+            if error < 0:
+                y += ystep
+                error += deltax
+        if steep:
+            xs, ys = ys, xs
+        self.write_points(xs, ys, color)
+
+
+class DictStorage(Storage):
+    """
+        pixels in a dictionary with (x, y) keys, as a Surface keeps them.
+        with tuples colors are stored as tuples, (0x7f, ) for 0x7f.
+    """
+    def __init__(self, width, height, surface=None, default=(0, ),
+                 tuples=True):
+        self.width = width
+        self.height = height
+        self.tuples = tuples
+        self.indexes = [(x, y) for y in range(height) for x in range(width)]
+        if surface is None:
+            surface = dict.fromkeys(self.indexes, default)
+        self.surface = surface
+
+    def encode(self, color):
+        if self.tuples and not isinstance(color, tuple):
+            color = (color, )
+        return color
+
+    def read(self, x, y):
+        return self.surface[(x, y)]
+
+    def write(self, x, y, color):
+        self.surface[(x, y)] = color
+
+    def write_points(self, xs, ys, color):
+        surface = self.surface
+        width, height = self.width, self.height
+        for x, y in zip(xs, ys):
+            if 0 <= x < width and 0 <= y < height:
+                surface[(x, y)] = color
+
+    def hline(self, x0, x1, y, color):
+        surface = self.surface
+        for x in range(x0, x1 + 1):
+            surface[(x, y)] = color
+
+    def vline(self, x, y0, y1, color):
+        surface = self.surface
+        for y in range(y0, y1 + 1):
+            surface[(x, y)] = color
+
+    def fill(self, color):
+        # in place, the surface dictionary may be shared.
+        surface = self.surface
+        for index in self.indexes:
+            surface[index] = color
+
+    def values(self, key=slice(None)):
+        surface = self.surface
+        return [surface[index] for index in self.indexes[key]]
+
+
+class RowStorage(Storage):
+    """ pixels in a list of rows, surface[y][x] is a pixel."""
+    def __init__(self, width, height, rows=None, default=()):
+        self.width = width
+        self.height = height
+        if rows is None:
+            rows = [[default] * width for y in range(height)]
+        self.surface = rows
+
+    def encode(self, color):
+        return color
+
+    def read(self, x, y):
+        return self.surface[y][x]
+
+    def write(self, x, y, color):
+        self.surface[y][x] = color
+
+    def write_points(self, xs, ys, color):
+        rows = self.surface
+        width, height = self.width, self.height
+        for x, y in zip(xs, ys):
+            if 0 <= x < width and 0 <= y < height:
+                rows[y][x] = color
+
+    def hline(self, x0, x1, y, color):
+        self.surface[y][x0:x1 + 1] = [color] * (x1 + 1 - x0)
+
+    def vline(self, x, y0, y1, color):
+        rows = self.surface
+        for y in range(y0, y1 + 1):
+            rows[y][x] = color
+
+    def fill(self, color):
+        for row in self.surface:
+            row[:] = [color] * self.width
+
+    def values(self, key=slice(None)):
+        return [color for row in self.surface for color in row][key]
+
+
+class ArrayStorage(Storage):
+    """
+        pixels in a numpy array of height x width bytes, or height x width
+        x channels for colors with more than one channel.
+        pixels can be given to draw on an existing array, such as the one
+        of a Framebuffer.
+    """
+    def __init__(self, width, height, pixels=None, channels=1):
+        # imported here, so drawing on a dict does not load numpy.
+        import numpy
+        self.width = width
+        self.height = height
+        self.channels = channels
+        if pixels is None:
+            shape = (height, width)
+            if channels > 1:
+                shape += (channels, )
+            pixels = numpy.zeros(shape, dtype=numpy.uint8)
+        self.pixels = pixels
+        # a flat view to draw lines in, reshaping anything but a
+        # contiguous array would copy it.
+        self.flat = None
+        if pixels.flags.c_contiguous:
+            self.flat = pixels.reshape((width * height, ) + pixels.shape[2:])
+        self.lines = {}
+
+    def encode(self, color):
+        if self.channels == 1 and isinstance(color, tuple):
+            color = color[0]
+        return color
+
+    def read(self, x, y):
+        if self.channels == 1:
+            return (int(self.pixels[y, x]), )
+        return tuple(int(c) for c in self.pixels[y, x])
+
+    def write(self, x, y, color):
+        self.pixels[y, x] = color
+
+    def write_points(self, xs, ys, color):
+        import numpy
+        xs = numpy.asarray(xs, dtype=numpy.intp)
+        ys = numpy.asarray(ys, dtype=numpy.intp)
+        inside = (xs >= 0) & (xs < self.width) & \
+                 (ys >= 0) & (ys < self.height)
+        self.pixels[ys[inside], xs[inside]] = color
+
+    def line_offsets(self, deltax, deltay, ystep, steep):
+        """
+            the offsets in flat of the pixels of a line from its start,
+            a line's shape only depends on these so they are kept.
+        """
+        key = (deltax, deltay, ystep, steep)
+        offsets = self.lines.get(key)
+        if offsets is None:
+            import numpy
+            # the y of step i is y1 moved once for every time the
+            # bresenham error went below zero in the steps before it.
+            steps = numpy.arange(deltax + 1)
+            moves = numpy.maximum(
+                0, (steps * deltay - deltax // 2 + deltax - 1) // deltax)
+            if steep:
+                offsets = steps * self.width + moves * ystep
+            else:
+                offsets = steps + moves * ystep * self.width
+            if len(self.lines) >= max_lines:
+                self.lines.clear()
+            self.lines[key] = offsets
+        return offsets
+
+    def write_line(self, x1, y1, x2, y2, steep, color):
+        deltax = x2 - x1
+        deltay = abs(y2 - y1)
+        ystep = 1 if y1 < y2 else -1
+        if steep:
+            x1, y1, x2, y2 = y1, x1, y2, x2
+        width, height = self.width, self.height
+        if self.flat is not None and \
+           0 <= min(x1, x2) and max(x1, x2) < width and \
+           0 <= min(y1, y2) and max(y1, y2) < height:
+            # a line is within its end points, no clipping needed.
+            offsets = self.line_offsets(deltax, deltay, ystep, steep)
+            self.flat[offsets + (y1 * width + x1)] = color
+            return
+        import numpy
+        steps = numpy.arange(deltax + 1)
+        moves = numpy.maximum(
+            0, (steps * deltay - deltax // 2 + deltax - 1) // deltax)
+        if steep:
+            xs, ys = x1 + moves * ystep, y1 + steps
+        else:
+            xs, ys = x1 + steps, y1 + moves * ystep
+        self.write_points(xs, ys, color)
+
+    def hline(self, x0, x1, y, color):
+        self.pixels[y, x0:x1 + 1] = color
+
+    def vline(self, x, y0, y1, color):
+        self.pixels[y0:y1 + 1, x] = color
+
+    def fill(self, color):
+        self.pixels[...] = color
+
+    def values(self, key=slice(None)):
+        return self.pixels.reshape(self.width * self.height, -1)[key]
+
+
+class PositionView(object):
+    """
+        a storage seen as a dictionary with (x, y) keys, for code written
+        against the surface dictionary of a Surface.
+    """
+    def __init__(self, storage, indexes):
+        self.storage = storage
+        self.indexes = indexes
+
+    def __getitem__(self, key):
+        x, y = key
+        return self.storage.read(x, y)
+
+    def __setitem__(self, key, value):
+        x, y = key
+        self.storage.write(x, y, self.storage.encode(value))
+
+    def __contains__(self, key):
+        x, y = key
+        return 0 <= x < self.storage.width and 0 <= y < self.storage.height
+
+    def __iter__(self):
+        return iter(self.indexes)
+
+    def __len__(self):
+        return len(self.indexes)
+
+    def keys(self):
+        return list(self.indexes)
+
+    def values(self):
+        return [self[index] for index in self.indexes]
+
+    def items(self):
+        return [(index, self[index]) for index in self.indexes]
+
+
+class Raster(object):
+    """
+        the drawing code shared by the Graphics classes, clipping and
+        rasterizing primitives in to a storage backend.
+    """
+    def __init__(self, storage):
+        self.storage = storage
+        self.width = storage.width
+        self.height = storage.height
+
+    def fill(self, color):
+        self.storage.fill(self.storage.encode(color))
+
+    def readPixel(self, x, y, default=None):
+        x, y = int(x), int(y)
+        if x < 0 or y < 0 or x >= self.width or y >= self.height:
+            return default
+        return self.storage.read(x, y)
+
+    def drawPixel(self, x, y, color):
+        x, y = int(x), int(y)
+        if x < 0 or y < 0 or x >= self.width or y >= self.height:
+            return
+        self.storage.write(x, y, self.storage.encode(color))
+
+    def hline(self, x0, x1, y, color):
+        if y < 0 or y >= self.height:
+            return
+        x0, x1 = max(min(x0, x1), 0), min(max(x0, x1), self.width - 1)
+        if x0 <= x1:
+            self.storage.hline(x0, x1, y, color)
+
+    def vline(self, x, y0, y1, color):
+        if x < 0 or x >= self.width:
+            return
+        y0, y1 = max(min(y0, y1), 0), min(max(y0, y1), self.height - 1)
+        if y0 <= y1:
+            self.storage.vline(x, y0, y1, color)
+
+    # http://rosettacode.org/wiki/Bitmap/Bresenham's_line_algorithm#Python
+    def drawLine(self, x1, y1, x2, y2, color):
+        x1, y1 = int(x1), int(y1)
+        x2, y2 = int(x2), int(y2)
+        color = self.storage.encode(color)
+        if y1 == y2:
+            self.hline(x1, x2, y1, color)
+            return
+        if x1 == x2:
+            self.vline(x1, y1, y2, color)
+            return
+        issteep = abs(y2 - y1) > abs(x2 - x1)
+        if issteep:
+            x1, y1 = y1, x1
+            x2, y2 = y2, x2
+        if x1 > x2:
+            x1, x2 = x2, x1
+            y1, y2 = y2, y1
+        self.storage.write_line(x1, y1, x2, y2, issteep, color)
+
+    def drawRect(self, x, y, width, height, color):
+        x, y = int(x), int(y)
+        width, height = int(width), int(height)
+        # because cordinate system starts at 0
+        width, height = width - 1, height - 1
+        self.drawLine(x, y, x + width, y, color)
+        self.drawLine(x, y + height, x + width, y + height, color)
+        self.drawLine(x, y, x, y + height, color)
+        self.drawLine(x + width, y, x + width, y + height, color)
+
+    def drawCircle(self, x0, y0, radius, color):
+        x0, y0 = int(x0), int(y0)
+        radius = int(radius)
+        # brensenham circle
+        error = 1 - radius
+        errory = 1
+        errorx = -2 * radius
+        x = radius
+        y = 0
+        xs = [x0, x0, x0 + radius, x0 - radius]
+        ys = [y0 + radius, y0 - radius, y0, y0]
+        while(y < x):
+            if(error > 0):
+                x -= 1
+                errorx += 2
+                error += errorx
+            y += 1
+            errory += 2
+            error += errory
+            xs += [x0 + x, x0 - x, x0 + x, x0 - x,
+                   x0 + y, x0 - y, x0 + y, x0 - y]
+            ys += [y0 + y, y0 + y, y0 - y, y0 - y,
+                   y0 + x, y0 + x, y0 - x, y0 - x]
+        self.storage.write_points(xs, ys, self.storage.encode(color))
+
+
+def channels(color):
+    """ a color as a tuple of ints, however the storage kept it."""
+    if isinstance(color, int):
+        return (color, )
+    return tuple(int(c) for c in color)
+
+
+def draw_test(raster):
+    """ draw every primitive a few times, as the benchmark does."""
+    raster.fill(0)
+    for i in range(0, raster.width, 4):
+        raster.drawLine(0, 0, i, raster.height - 1, 0x7f)
+        raster.drawLine(raster.width - 1, i % raster.height, i, 0, 0x40)
+    for i in range(1, raster.height // 2, 3):
+        raster.drawCircle(raster.width / 2, raster.height / 2, i, 0x60)
+        raster.drawRect(i, i, raster.width - 2 * i, raster.height - 2 * i, i)
+    raster.drawPixel(-1, 5, 0x7f)
+    raster.drawLine(-10, -5, raster.width + 10, raster.height + 5, 0x11)
+
+
+def benchmark(frames=100, width=96, height=48):
+    """
+        time draw_test on every storage backend, returns seconds per
+        frame by name, and whether they all drew the same pixels.
+    """
+    backends = {
+        'dict': DictStorage(width, height),
+        'rows': RowStorage(width, height, default=(0, )),
+    }
+    try:
+        backends['array'] = ArrayStorage(width, height)
+    except ImportError:
+        pass
+    results = {}
+    drawn = []
+    for name in sorted(backends):
+        raster = Raster(backends[name])
+        start = time.time()
+        for i in range(frames):
+            draw_test(raster)
+        results[name] = (time.time() - start) / frames
+        drawn.append([channels(value) for value in backends[name].values()])
+    identical = all(values == drawn[0] for values in drawn)
+    return results, identical
+
+
+def main():
+    results, identical = benchmark()
+    for name in sorted(results):
+        print("%-6s %8.3f ms/frame" % (name, results[name] * 1000))
+    print("identical output: %s" % identical)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+import time
+import numpy
+from Framebuffer import Framebuffer
+
+ledboard_width, ledboard_height = 96, 48
+
+
+class Simulation(object):
+    """
+        a world of width x height that can be larger than the board,
+        render draws the part of it under the viewport on a surface.
+    """
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.viewport = (0, 0)
+
+    def set_viewport(self, x, y):
+        x = max(0, min(int(x), self.width - 1))
+        y = max(0, min(int(y), self.height - 1))
+        self.viewport = (x, y)
+
+    def step(self):
+        pass
+
+    def render(self, surface):
+        pass
+
+
+class Automaton(Simulation):
+    """ a simulation whose state is one byte per cell, 0 or 1."""
+    def __init__(self, width, height):
+        Simulation.__init__(self, width, height)
+        self.cells = numpy.zeros((height, width), dtype=numpy.uint8)
+
+    def clear(self):
+        self.cells.fill(0)
+
+    def seed(self, density=.3):
+        """ fill the world with random cells."""
+        self.cells[...] = numpy.random.random(self.cells.shape) < density
+
+    def render(self, surface):
+        x, y = self.viewport
+        view = self.cells[y:y + surface.height, x:x + surface.width]
+        h, w = view.shape
+        surface.pixels.fill(0)
+        numpy.multiply(view, surface.color_depth,
+                       out=surface.pixels[:h, :w], casting='unsafe')
+        return surface
+
+
+class Life(Automaton):
+    """
+        conway's game of life, neighbours are counted by summing the
+        eight shifted views of a padded copy of the world.
+    """
+    def __init__(self, width, height, wrap=True):
+        Automaton.__init__(self, width, height)
+        self.wrap = wrap
+        self.padded = numpy.zeros((height + 2, width + 2), dtype=numpy.uint8)
+        self.count = numpy.zeros((height, width), dtype=numpy.uint8)
+
+    def pad(self):
+        p = self.padded
+        p[1:-1, 1:-1] = self.cells
+        if self.wrap:
+            p[0, 1:-1] = self.cells[-1]
+            p[-1, 1:-1] = self.cells[0]
+            p[:, 0] = p[:, -2]
+            p[:, -1] = p[:, 1]
+        return p
+
+    def step(self):
+        p = self.pad()
+        h, w = self.height, self.width
+        count = self.count
+        count[...] = p[0:h, 0:w]
+        count += p[0:h, 1:w + 1]
+        count += p[0:h, 2:w + 2]
+        count += p[1:h + 1, 0:w]
+        count += p[1:h + 1, 2:w + 2]
+        count += p[2:h + 2, 0:w]
+        count += p[2:h + 2, 1:w + 1]
+        count += p[2:h + 2, 2:w + 2]
+        self.cells[...] = (count == 3) | ((count == 2) & (self.cells == 1))
+
+
+class Sand(Automaton):
+    """
+        falling sand, grains drop when the cell below is empty,
+        otherwise they slide down diagonally, alternating the
+        preferred side every step.
+    """
+    def __init__(self, width, height):
+        Automaton.__init__(self, width, height)
+        self.side = 1
+
+    def pour(self, x, y=0, width=1):
+        """ drop grains on row y, from x to x + width."""
+        x = max(0, int(x))
+        self.cells[int(y), x:x + int(width)] = 1
+
+    def step(self):
+        cells = self.cells
+        above, below = cells[:-1], cells[1:]
+        # grains that can not fall straight down at the start of the step.
+        blocked = (above == 1) & (below == 1)
+
+        fall = (above == 1) & (below == 0)
+        above[fall] = 0
+        below[fall] = 1
+
+        if self.side > 0:
+            move = blocked[:, :-1] & (cells[1:, 1:] == 0)
+            cells[:-1, :-1][move] = 0
+            cells[1:, 1:][move] = 1
+        else:
+            move = blocked[:, 1:] & (cells[1:, :-1] == 0)
+            cells[:-1, 1:][move] = 0
+            cells[1:, :-1][move] = 1
+        self.side = -self.side
+
+
+class Particles(Simulation):
+    """
+        particles kept as structure of arrays, one array per property,
+        up to capacity particles are alive at the same time.
+    """
+    def __init__(self, width, height, capacity=1024, gravity=30.):
+        Simulation.__init__(self, width, height)
+        self.capacity = capacity
+        self.gravity = gravity
+        self.x = numpy.zeros(capacity, dtype=numpy.float32)
+        self.y = numpy.zeros(capacity, dtype=numpy.float32)
+        self.vx = numpy.zeros(capacity, dtype=numpy.float32)
+        self.vy = numpy.zeros(capacity, dtype=numpy.float32)
+        self.life = numpy.zeros(capacity, dtype=numpy.float32)
+        self.max_life = 1.
+        self.alive = numpy.zeros(capacity, dtype=bool)
+
+    def emit(self, x, y, vx, vy, life):
+        """ spawn particles in free slots, arguments are arrays or scalars."""
+        x, y, vx, vy, life = numpy.broadcast_arrays(x, y, vx, vy, life)
+        slots = numpy.flatnonzero(~self.alive)[:x.size]
+        n = len(slots)
+        self.x[slots] = x.ravel()[:n]
+        self.y[slots] = y.ravel()[:n]
+        self.vx[slots] = vx.ravel()[:n]
+        self.vy[slots] = vy.ravel()[:n]
+        self.life[slots] = life.ravel()[:n]
+        self.alive[slots] = True
+        return n
+
+    def step(self, dt=1. / 30):
+        # dead slots are updated too, that is cheaper than masking.
+        self.vy += self.gravity * dt
+        self.x += self.vx * dt
+        self.y += self.vy * dt
+        self.life -= dt
+        alive = self.alive
+        alive &= self.life > 0
+        alive &= (self.x >= 0) & (self.x < self.width)
+        alive &= (self.y >= 0) & (self.y < self.height)
+
+    def render(self, surface):
+        vx, vy = self.viewport
+        surface.pixels.fill(0)
+        alive = self.alive
+        x = self.x[alive].astype(numpy.intp) - vx
+        y = self.y[alive].astype(numpy.intp) - vy
+        inside = (x >= 0) & (x < surface.width) & \
+                 (y >= 0) & (y < surface.height)
+        brightness = numpy.clip(self.life[alive][inside] / self.max_life, 0, 1)
+        surface.pixels[y[inside], x[inside]] = \
+            (brightness * surface.color_depth).astype(numpy.uint8)
+        return surface
+
+
+class Fountain(Particles):
+    """ particles shot upward from a source with a random spread."""
+    def __init__(self, width, height, source=None, rate=20, speed=45.,
+                 spread=12., capacity=1024, gravity=30.):
+        Particles.__init__(self, width, height, capacity, gravity)
+        if source is None:
+            source = (width / 2., height - 1.)
+        self.source = source
+        self.rate = rate
+        self.speed = speed
+        self.spread = spread
+        self.max_life = 3.
+
+    def step(self, dt=1. / 30):
+        n = self.rate
+        sx, sy = self.source
+        vx = numpy.random.normal(0, self.spread, n)
+        vy = -self.speed * numpy.random.uniform(.7, 1., n)
+        life = numpy.random.uniform(1., self.max_life, n)
+        self.emit(sx, sy, vx, vy, life)
+        Particles.step(self, dt)
+
+
+def benchmark(steps=100, sizes=None):
+    """
+        time a step of every simulation for a few world sizes,
+        returns seconds per step by (name, width, height).
+    """
+    if sizes is None:
+        sizes = [(ledboard_width, ledboard_height),
+                 (ledboard_width * 4, ledboard_height * 4),
+                 (1024, 1024)]
+    results = {}
+    for width, height in sizes:
+        life = Life(width, height)
+        life.seed()
+        sand = Sand(width, height)
+        sand.seed(.1)
+        fountain = Fountain(width, height, capacity=4096, rate=100)
+        for name, sim in (('life', life), ('sand', sand),
+                          ('fountain', fountain)):
+            start = time.time()
+            for i in range(steps):
+                sim.step()
+            results[(name, width, height)] = (time.time() - start) / steps
+    return results
+
+
+def benchmark_test():
+    results = benchmark()
+    for key in sorted(results):
+        name, width, height = key
+        print("%-10s %5dx%-5d %8.3f ms/step" %
+              (name, width, height, results[key] * 1000))
+
+
+def simulation_test(sim, fps=30):
+    from ledboard import get_netcon
+
+    netcon = get_netcon()
+    surface = Framebuffer(ledboard_width, ledboard_height)
+    while(True):
+        sim.step()
+        netcon.send_packet(sim.render(surface))
+        time.sleep(1. / fps)
+
+
+def life_test(fps=30):
+    life = Life(ledboard_width, ledboard_height)
+    life.seed()
+    simulation_test(life, fps)
+
+
+def sand_test(fps=30):
+    from ledboard import get_netcon
+
+    netcon = get_netcon()
+    sand = Sand(ledboard_width, ledboard_height)
+    surface = Framebuffer(ledboard_width, ledboard_height)
+    while(True):
+        sand.pour(ledboard_width / 2 - 2, 0, 4)
+        sand.step()
+        netcon.send_packet(sand.render(surface))
+        time.sleep(1. / fps)
+
+
+def fountain_test(fps=30):
+    simulation_test(Fountain(ledboard_width, ledboard_height), fps)
+
+
+def main():
+    benchmark_test()
+    # life_test()
+    # sand_test()
+    # fountain_test()
+
+if __name__ == "__main__":
+    main()
@@ -3,14 +3,21 @@ class Surface(object):
         if surface:
             pass
         if width and height:
-            self.width = width
-            self.height = height
-            self.size = self.width * self.height
-            self.color_rep = (0, )
-            self.color_depth = 0x7f
-            self.indexes = self.gen_indexes()
+            self.set_size(width, height)
             self.surface = self.gen_surface()
 
+    """
+        set the dimensions, the color info and the positional
+        indexes, everything but the surface itself.
+    """
+    def set_size(self, width, height):
+        self.width = width
+        self.height = height
+        self.size = self.width * self.height
+        self.color_rep = (0, )
+        self.color_depth = 0x7f
+        self.indexes = self.gen_indexes()
+
     """
         generate a dictionary as surface that has,
         positional keys, and pixel data as value.
@@ -58,8 +65,9 @@ class Surface(object):
 
 
 def main():
-    from ledboard import netcon
+    from ledboard import get_netcon
 
+    netcon = get_netcon()
     ledboard_width, ledboard_height = 96, 48
     ledboard = Surface(width=ledboard_width, height=ledboard_height)
     for i in range(0, ledboard_height, 1):
@@ -0,0 +1,67 @@
+import ledboard
+
+demos = ['clock', 'lines', 'board', 'tama', 'media',
+         'effect', 'life', 'sand', 'fountain', 'server']
+
+
+def run_demo(demo, arg=None, fps=30):
+    if demo == 'clock':
+        ledboard.analog_clock_test(fps)
+    elif demo == 'lines':
+        ledboard.line_test()
+    elif demo == 'board':
+        ledboard.ledboard_test()
+    elif demo == 'tama':
+        ledboard.tama_test(fps)
+    elif demo == 'media':
+        ledboard.media_test(arg, fps)
+    elif demo == 'effect':
+        from Effects import effect_test
+        effect_test(arg or 'plasma', fps)
+    elif demo in ('life', 'sand', 'fountain'):
+        import Simulations
+        getattr(Simulations, demo + '_test')(fps)
+    elif demo == 'server':
+        from DisplayServer import DisplayServer
+        DisplayServer(ledboard.get_netcon(), fps=fps).serve_forever()
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="show a demo on the ledboard.")
+    parser.add_argument('demo', choices=demos)
+    parser.add_argument('arg', nargs='?',
+                        help="frame file for media, effect name or "
+                             "expression for effect")
+    parser.add_argument('--host', default=ledboard.destination[0])
+    parser.add_argument('--port', type=int, default=ledboard.destination[1])
+    parser.add_argument('--fps', type=float, default=30)
+    parser.add_argument('--layout', choices=ledboard.layouts,
+                        default=ledboard.layout,
+                        help="server only, which region of the board "
+                             "each panel index leases")
+    parser.add_argument('--adaptive', action='store_true',
+                        help="back off packet gap and chunk size on a full "
+                             "send buffer, without --acks it only ever "
+                             "slows down")
+    parser.add_argument('--acks', action='store_true',
+                        help="pace on acks of shown frames from the "
+                             "receiver, such as Emulator.py, which can "
+                             "also speed up")
+    args = parser.parse_args(argv)
+    if args.demo == 'media' and not args.arg:
+        parser.error("media needs a frame file")
+    if args.demo != 'server' and args.layout != ledboard.layout:
+        parser.error("--layout only applies to the server demo")
+
+    adaptive = None
+    if args.adaptive or args.acks:
+        adaptive = ledboard.AdaptivePacer(acks=args.acks)
+    ledboard.set_destination(args.host, args.port, adaptive)
+    ledboard.set_layout(args.layout)
+    run_demo(args.demo, args.arg, args.fps)
+
+if __name__ == "__main__":
+    main()
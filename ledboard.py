@@ -1,26 +1,91 @@
 import math
 import time
+import errno
 import socket
+import struct
+import collections
 from Surface import Surface
-import urllib
-import json
+from Raster import Raster, DictStorage, ArrayStorage, PositionView
 
 panel_width, panel_height = 32, 16
 ledboard_width, ledboard_height = 96, 48
 
-# panelorder = [(2, 0), (2, 1), (2, 2),
-#               (1, 2), (1, 1), (1, 0),
-#               (0, 0), (0, 1), (0, 2),
-#               ]
-
-panelorder = []
-for x in range(0, 3):
-    for y in range(0, 3):
-        pos = (x, y)
-        panelorder.append(pos)
+# panel positions in the order the board chains them, by layout name.
+layouts = ['columns', 'serpentine']
+layout = 'columns'
+_panelorder = None
 
 destination = 'ledboard', 1337
 
+# the ack a receiver sends at the end of every frame, 'A', 1 when the
+# frame was shown or 0 when it was torn, and the bytes it got of it.
+ack_format = '!cBI'
+pacer = None
+_netcon = None
+
+
+def gen_panelorder(layout='columns'):
+    """
+        generate the (x, y) positions of the panels,
+        columns goes down every column from the left,
+        serpentine goes from the right, alternating up and down.
+    """
+    panelorder = []
+    if layout == 'serpentine':
+        for x in range(2, -1, -1):
+            ys = range(0, 3)
+            if x % 2:
+                ys = reversed(ys)
+            for y in ys:
+                panelorder.append((x, y))
+    else:
+        for x in range(0, 3):
+            for y in range(0, 3):
+                pos = (x, y)
+                panelorder.append(pos)
+    return panelorder
+
+
+def get_panelorder():
+    """ the panel order of the current layout, generated on first use."""
+    global _panelorder
+    if _panelorder is None:
+        _panelorder = gen_panelorder(layout)
+    return _panelorder
+
+
+def set_layout(name):
+    global layout, _panelorder
+    if name not in layouts:
+        raise ValueError("unknown layout %r" % (name, ))
+    layout = name
+    _panelorder = None
+
+
+def get_netcon():
+    """ the connector for destination, created on first use."""
+    global _netcon
+    if _netcon is None:
+        _netcon = NetworkConnector(*destination, pacer=pacer)
+    return _netcon
+
+
+def set_destination(host, port=1337, adaptive=None):
+    """ point get_netcon at host, pacing it with adaptive when given."""
+    global destination, pacer, _netcon
+    destination = host, port
+    pacer = adaptive
+    _netcon = None
+
+
+def __getattr__(name):
+    # netcon and panelorder used to be made at import time.
+    if name == 'netcon':
+        return get_netcon()
+    if name == 'panelorder':
+        return get_panelorder()
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
 
 def posgen(width, height):
     """ generates a sequence of positional tuples."""
@@ -36,156 +101,283 @@ def flattenl(l):
     return [x for sublist in l for x in sublist]
 
 
+class AdaptivePacer(object):
+    """
+        tunes the gap between packets and the chunk size of a
+        NetworkConnector, within the given bounds, from delivery feedback.
+        with acks the receiver, such as Emulator, reports whether it
+        showed every frame. shown frames shrink the gap, and once it is at
+        its minimum grow the chunks, torn or missing frames back off both.
+        without acks a full send buffer is the only feedback, which udp
+        rarely gives, so that mode only ever slows down: min_gap and
+        max_chunk default to the starting gap and chunksize then.
+    """
+    def __init__(self, min_gap=None, max_gap=0.02, min_chunk=256,
+                 max_chunk=None, gap=0.005, chunksize=512, acks=False,
+                 ack_timeout=0.25, increase=2., decrease=0.9, retries=10):
+        if min_gap is None:
+            min_gap = 0.0005 if acks else gap
+        if max_chunk is None:
+            max_chunk = 1408 if acks else chunksize
+        self.min_gap, self.max_gap = min_gap, max_gap
+        self.min_chunk, self.max_chunk = min_chunk, max_chunk
+        self.gap = gap
+        self.chunksize = chunksize
+        self.acks = acks
+        self.ack_timeout = ack_timeout
+        self.increase = increase
+        self.decrease = decrease
+        self.retries = retries
+        self.pending = collections.deque()
+        self.congested = False
+        self.start = time.time()
+        self.frames = 0
+        self.delivered = 0
+        self.lost = 0
+        self.pressure = 0
+        self.dropped = 0
+
+    def send(self, sock, packet, target):
+        """ send a datagram, waiting a gap while the send buffer is full."""
+        for i in range(self.retries):
+            try:
+                sock.sendto(packet, target)
+                return
+            except socket.error as e:
+                if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK,
+                                   errno.ENOBUFS):
+                    raise
+                self.pressure += 1
+                self.congested = True
+                time.sleep(max(self.gap, self.min_gap))
+        self.dropped += 1
+
+    def receive(self, sock):
+        """ match the acks waiting on the socket with the frames sent."""
+        while(True):
+            try:
+                data = sock.recv(64)
+            except socket.error as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                raise
+            if len(data) != struct.calcsize(ack_format) or \
+               data[:1] != b'A' or not self.pending:
+                continue
+            kind, shown, received = struct.unpack(ack_format, data)
+            self.pending.popleft()
+            if shown:
+                self.success()
+            else:
+                self.failure()
+        now = time.time()
+        while(self.pending and now - self.pending[0] > self.ack_timeout):
+            self.pending.popleft()
+            self.failure()
+
+    def success(self):
+        self.delivered += 1
+        if self.gap > self.min_gap:
+            self.gap = max(self.min_gap, self.gap * self.decrease)
+        else:
+            self.chunksize = min(self.max_chunk, self.chunksize + 64)
+
+    def failure(self):
+        self.lost += 1
+        self.gap = min(self.max_gap, self.gap * self.increase)
+        self.chunksize = max(self.min_chunk, self.chunksize * 3 // 4)
+
+    def update(self, connector, size):
+        """ account for a frame of size bytes and retune the connector."""
+        self.frames += 1
+        if self.congested:
+            self.failure()
+        if self.acks:
+            self.pending.append(time.time())
+            self.receive(connector.sock)
+        elif not self.congested:
+            self.success()
+        self.congested = False
+        connector.send_timeout = self.gap
+        connector.maxsend_size = self.chunksize
+
+    def stats(self):
+        elapsed = max(time.time() - self.start, 1e-9)
+        judged = self.delivered + self.lost
+        return {
+            'gap': self.gap,
+            'chunksize': self.chunksize,
+            'frames': self.frames,
+            'delivered': self.delivered,
+            'lost': self.lost,
+            'delivery': float(self.delivered) / judged if judged else 1.,
+            'pressure': self.pressure,
+            'dropped': self.dropped,
+            'fps': self.frames / elapsed,
+        }
+
+
 class NetworkConnector(object):
     """
         this object discribes a networkconnection,
         for a thing such as the ledboard @ tkkrlab
+        pass an AdaptivePacer as pacer to have maxsend_size and
+        send_timeout tuned while sending.
     """
-    def __init__(self, ip, port, maxsend_size=512, send_timeout=0.005):
+    def __init__(self, ip, port, maxsend_size=512, send_timeout=0.005,
+                 pacer=None):
         self.ip = ip
         self.port = port
         self.target = (self.ip, self.port)
         self.maxsend_size = maxsend_size
         self.send_timeout = send_timeout
+        self.pacer = pacer
+        if pacer is not None:
+            self.maxsend_size = pacer.chunksize
+            self.send_timeout = pacer.gap
+
+        self._sock = None
+        self.packet_start = b'\x00'
 
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.packet_start = '\x00'
+    def connect(self):
+        """
+            create the socket and resolve the host once,
+            instead of on every sendto.
+        """
+        # resolve first, a failed lookup leaves no socket behind, so the
+        # next send tries again instead of looking up on every sendto.
+        target = (socket.gethostbyname(self.ip), self.port)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if self.pacer is not None:
+            # a full send buffer should be reported, not block.
+            sock.setblocking(False)
+        self.target = target
+        self._sock = sock
+
+    @property
+    def sock(self):
+        if self._sock is None:
+            self.connect()
+        return self._sock
+
+    @sock.setter
+    def sock(self, sock):
+        self._sock = sock
 
     def compress(self, data):
         """ 'compress' a list of data in to a single string of bytes."""
-        compressed = ''
-        for i, value in enumerate(data):
-            for c in value:
-                compressed += chr(c)
-        return compressed
+        if hasattr(data, 'tobytes'):
+            # a chunk of a Framebuffer is an array of bytes already.
+            return data.tobytes()
+        return bytes(bytearray(c for value in data for c in value))
 
     def chunked(self, data, chunksize):
         """ yield sections 'chunks' of data, with iteration count."""
         chunk = []
         it = 0
-        while(it < (len(data) / chunksize)):
+        while(it * chunksize < len(data)):
             index = (it * chunksize)
             chunk = data[index:(index + chunksize)]
             yield (it, chunk)
             it += 1
 
-    def send_packet(self, data):
+    def packets(self, data):
+        """ yield the datagrams for data, a reset followed by the chunks."""
+        for i, chunk in self.chunked(data, self.maxsend_size):
+            # print(i, len(chunk), chunk)
+            if not i:
+                yield b'\x80'
+            yield b'\x00' + self.compress(chunk)
+
+    def send_packet(self, data, chunks=None):
         """
             first time send with reset, after send all other,
             chunks of data.
+            chunks optionally lists the indexes of the chunks that changed,
+            nothing is sent when none changed. otherwise the whole frame
+            is, the board only shows a frame it received completely.
         """
+        if chunks is not None and not chunks:
+            return
+        sent = 0
         if len(data) > self.maxsend_size:
-            for i, chunk in self.chunked(data, self.maxsend_size):
-                # print(i, len(chunk), chunk)
-                if i:
-                    self.sock.sendto('\x00' + self.compress(chunk), self.target)
-                else:
-                    self.sock.sendto('\x80', self.target)
-                    time.sleep(self.send_timeout)
-                    self.sock.sendto('\x00' + self.compress(chunk), self.target)
+            for packet in self.packets(data):
+                self.send(packet)
+                sent += len(packet) - 1
                 time.sleep(self.send_timeout)
         else:
-            self.sock.sendto('\x80' + self.compress(data),
-                             self.target)
-            self.sock.sendto('\x00' + self.compress(data),
-                             self.target)
+            for packet in (b'\x80' + self.compress(data),
+                           b'\x00' + self.compress(data)):
+                self.send(packet)
+                sent += len(packet) - 1
+        if self.pacer is not None:
+            self.pacer.update(self, sent)
+
+    def send(self, packet):
+        if self.pacer is None:
+            self.sock.sendto(packet, self.target)
+        else:
+            self.pacer.send(self.sock, packet, self.target)
 
-netcon = NetworkConnector('ledboard', 1337)
+    def stats(self):
+        """ the pacing parameters and delivery statistics."""
+        if self.pacer is None:
+            return {'gap': self.send_timeout, 'chunksize': self.maxsend_size}
+        return self.pacer.stats()
 
 
 class Graphics(Surface):
-    def __init__(self, width, height):
-        Surface.__init__(self, width=width, height=height)
+    """
+        drawing on a Surface, done by the shared Raster.
+        storage 'dict' keeps the pixels in the Surface dictionary,
+        'array' in a compact numpy array.
+    """
+    def __init__(self, width, height, storage='dict'):
+        if storage not in ('dict', 'array'):
+            raise ValueError("unknown storage %r" % (storage, ))
+        self.set_size(width, height)
+        if storage == 'dict':
+            self.surface = self.gen_surface()
+            self.storage = DictStorage(width, height, self.surface)
+        else:
+            self.storage = ArrayStorage(width, height)
+            self.surface = PositionView(self.storage, self.indexes)
+        self.raster = Raster(self.storage)
 
     def fill(self, color):
-        self.surface = self.gen_surface(color)
+        self.raster.fill(color)
+
+    def readPixel(self, x, y):
+        return self.raster.readPixel(x, y, self.color_rep)
 
     def drawPixel(self, x, y, color):
-        if x < 0 or y < 0:
-            return
-        if x >= self.width or y >= self.height:
-            return
-        pos = (x, y)
-        if not isinstance(color, tuple):
-            color = (color, )
-        self.surface[pos] = color
+        self.raster.drawPixel(x, y, color)
 
-    # http://rosettacode.org/wiki/Bitmap/Bresenham's_line_algorithm#Python
     def drawLine(self, x1, y1, x2, y2, color):
-        x1, y1 = int(x1), int(y1)
-        x2, y2 = int(x2), int(y2)
-        issteep = abs(y2 - y1) > abs(x2 - x1)
-        if issteep:
-            x1, y1 = y1, x1
-            x2, y2 = y2, x2
-        rev = False
-        if x1 > x2:
-            x1, x2 = x2, x1
-            y1, y2 = y2, y1
-            rev = True
-        deltax = x2 - x1
-        deltay = abs(y2 - y1)
-        error = int(deltax / 2)
-        y = y1
-        ystep = None
-        if y1 < y2:
-            ystep = 1
-        else:
-            ystep = -1
-        for x in range(x1, x2 + 1):
-            if issteep:
-                self.drawPixel(y, x, color)
-            else:
-                self.drawPixel(x, y, color)
-            error -= deltay
-            if error < 0:
-                y += ystep
-                error += deltax
-        # if rev:
-        #     self.surface.reverse()
+        self.raster.drawLine(x1, y1, x2, y2, color)
 
     def drawRect(self, x, y, width, height, color):
-        x, y = int(x), int(y)
-        width, height = int(width), int(height)
-        # because cordinate system starts at 0
-        width, height = width - 1, height - 1
-        self.drawLine(x, y, x + width, y, color)
-        self.drawLine(x, y + height, x + width, y + height, color)
-        self.drawLine(x, y, x, y + height, color)
-        self.drawLine(x + width, y, x + width, y + height, color)
+        self.raster.drawRect(x, y, width, height, color)
 
     def drawCircle(self, x0, y0, radius, color):
-        x0, y0 = int(x0), int(y0)
-        radius = int(radius)
-        # brensenham circle
-        error = 1 - radius
-        errory = 1
-        errorx = -2 * radius
-        x = radius
-        y = 0
-        self.drawPixel(x0, y0 + radius, color)
-        self.drawPixel(x0, y0 - radius, color)
-        self.drawPixel(x0 + radius, y0, color)
-        self.drawPixel(x0 - radius, y0, color)
-        while(y < x):
-            if(error > 0):
-                x -= 1
-                errorx += 2
-                error += errorx
-            y += 1
-            errory += 2
-            error += errory
-            self.drawPixel(x0 + x, y0 + y, color)
-            self.drawPixel(x0 - x, y0 + y, color)
-            self.drawPixel(x0 + x, y0 - y, color)
-            self.drawPixel(x0 - x, y0 - y, color)
-            self.drawPixel(x0 + y, y0 + x, color)
-            self.drawPixel(x0 - y, y0 + x, color)
-            self.drawPixel(x0 + y, y0 - x, color)
-            self.drawPixel(x0 - y, y0 - x, color)
-            self.drawPixel(x0 - y, y0 + x, color)
-            self.drawPixel(x0 + y, y0 - x, color)
-            self.drawPixel(x0 - y, y0 - x, color)
+        self.raster.drawCircle(x0, y0, radius, color)
+
+    def get_list_rep(self):
+        return self.storage.values()
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.storage.values(key)
+        else:
+            x, y = key
+            return self.storage.read(x, y)
+
+    def __setitem__(self, key, value):
+        x, y = key
+        self.storage.write(x, y, self.storage.encode(value))
+
+    def __len__(self):
+        return self.size
 
     """
         ledgraphics object info print.
@@ -230,7 +422,7 @@ class AnalogClock(Graphics):
         self.drawLine(xs, ys, x, y, color)
 
     def draw_face(self):
-        for i in range(0, 360, 360 / 12):
+        for i in range(0, 360, 360 // 12):
             ir = math.radians(i)
             x, y = math.cos(ir) * self.radius, math.sin(ir) * self.radius
             xp, yp = self.pos
@@ -260,7 +452,7 @@ def ledboard_test():
         pos, c = (i + 48, i), c
         ledboard[pos] = c
 
-    netcon.send_packet(ledboard)
+    get_netcon().send_packet(ledboard)
 
 
 def line_test():
@@ -269,20 +461,28 @@ def line_test():
     ledboard.drawLine(0, ledboard_height, ledboard_width, 0, 0x7f)
     ledboard.drawLine(50, 0, ledboard_width / 4, ledboard_height, 0x7f)
     ledboard.drawLine(50, ledboard_height / 3, ledboard_width / 4, 0, 0x7f)
-    netcon.send_packet(ledboard)
+    get_netcon().send_packet(ledboard)
 
 
-def analog_clock_test():
+def analog_clock_test(fps=30):
     # pos = (ledboard_width / 4, 0)
+    netcon = get_netcon()
     clock = AnalogClock(ledboard_width, ledboard_height)
     while(True):
         clock.generate()
         netcon.send_packet(clock)
+        time.sleep(1. / fps)
 
 
 def generate_image():
+    import json
+    try:
+        from urllib.request import urlopen
+    except ImportError:
+        from urllib import urlopen
+
     url = 'http://tamahive.spritesserver.nl/gettama.php'
-    response = urllib.urlopen(url)
+    response = urlopen(url)
     data = json.loads(response.read())
     tama = data['tama']
     first_hive = tama[0]
@@ -318,22 +518,44 @@ def generate_image():
     return ledboard
 
 
-def tama_test():
+def tama_test(fps=50):
+    netcon = get_netcon()
     while(True):
         netcon.send_packet(generate_image())
-        time.sleep(0.02)
-
-
-def main():
-    surface = Surface(width=48, height=96)
-    # surface.set_color_rep((0, ))
-    # surface.set_color_depth(0x7f)
-    # surface[(1, 1)] = (0x7f,)
-    # netcon.send_packet(surface)
-    analog_clock_test()
-    # ledboard_test()
-    # line_test()
-    # tama_test()
+        time.sleep(1. / fps)
+
+
+def media_test(path, fps=25, loop=True):
+    """
+        play a file of raw 8 bit grayscale frames of the board size,
+        as made by: ffmpeg -i movie -s 96x48 -pix_fmt gray -f rawvideo
+    """
+    import numpy
+    from Framebuffer import Framebuffer
+
+    netcon = get_netcon()
+    frames = numpy.memmap(path, dtype=numpy.uint8, mode='r')
+    frames = frames[:len(frames) // (ledboard_width * ledboard_height) *
+                    ledboard_width * ledboard_height]
+    frames = frames.reshape(-1, ledboard_height, ledboard_width)
+    if not len(frames):
+        raise ValueError("%s is shorter than one %dx%d frame" %
+                         (path, ledboard_width, ledboard_height))
+    surface = Framebuffer(ledboard_width, ledboard_height)
+    while(True):
+        for frame in frames:
+            numpy.right_shift(frame, 1, out=surface.pixels)
+            netcon.send_packet(surface)
+            time.sleep(1. / fps)
+        if not loop:
+            break
+
+
+def main(argv=None):
+    # run as a script this module is __main__, the demos configure the
+    # imported ledboard module that the other modules share instead.
+    import demos
+    demos.main(argv)
 
 if __name__ == "__main__":
     main()